@@ -16,8 +16,12 @@
 
     // --- 配置 ---
     const SERVER_URL = "ws://localhost:5102/ws"; // 与 api_server.py 中的端口匹配
+    const DEBUG_LOG_PAYLOAD = false; // 设为 true 时输出完整的请求载荷（含 base64 附件），仅用于调试
     let socket;
     let isCaptureModeActive = false; // ID捕获模式的开关
+    // 重连间隔阶梯（毫秒）：连续失败时逐级延长，连接成功后重置
+    const RECONNECT_DELAYS = [1000, 2000, 5000, 10000, 20000, 30000];
+    let reconnectIndex = 0;
 
     // --- 核心逻辑 ---
     function connect() {
@@ -26,6 +30,7 @@
 
         socket.onopen = () => {
             console.log("[API Bridge] ✅ 与本地服务器的 WebSocket 连接已建立。");
+            reconnectIndex = 0;
             document.title = "✅ " + document.title;
         };
 
@@ -67,11 +72,13 @@
         };
 
         socket.onclose = () => {
-            console.warn("[API Bridge] 🔌 与本地服务器的连接已断开。将在5秒后尝试重新连接...");
+            const delay = RECONNECT_DELAYS[reconnectIndex];
+            reconnectIndex = Math.min(reconnectIndex + 1, RECONNECT_DELAYS.length - 1);
+            console.warn(`[API Bridge] 🔌 与本地服务器的连接已断开。将在${delay / 1000}秒后尝试重新连接...`);
             if (document.title.startsWith("✅ ")) {
                 document.title = document.title.substring(2);
             }
-            setTimeout(connect, 5000);
+            setTimeout(connect, delay);
         };
 
         socket.onerror = (error) => {
@@ -143,7 +150,13 @@
             modelId: target_model_id,
         };
 
-        console.log("[API Bridge] 准备发送到 LMArena API 的最终载荷:", JSON.stringify(body, null, 2));
+        // 默认只输出载荷摘要：完整载荷可能包含 base64 附件，格式化输出会占用大量时间和内存
+        if (DEBUG_LOG_PAYLOAD) {
+            console.log("[API Bridge] 准备发送到 LMArena API 的最终载荷:", JSON.stringify(body, null, 2));
+        } else {
+            const attachmentCount = newMessages.reduce((count, msg) => count + msg.experimental_attachments.length, 0);
+            console.log(`[API Bridge] 准备发送到 LMArena API 的最终载荷: ${newMessages.length} 条消息, ${attachmentCount} 个附件, 模型 ID: ${target_model_id || '未指定'}`);
+        }
 
         // 设置一个标志，让我们的 fetch 拦截器知道这个请求是脚本自己发起的
         window.isApiBridgeRequest = true;
@@ -2,6 +2,7 @@
 # 新一代 LMArena Bridge 后端服务
 
 import asyncio
+import hashlib
 import json
 import logging
 import os
@@ -16,23 +17,74 @@ import mimetypes
 from datetime import datetime
 from contextlib import asynccontextmanager
 
-import uvicorn
-import requests
-from packaging.version import parse as parse_version
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import StreamingResponse, JSONResponse, Response
 
+try:
+    import orjson # 可选依赖：安装后用于加速流式数据块的 JSON 编解码
+except ImportError:
+    orjson = None
+
 # --- 内部模块导入 ---
-from modules.file_uploader import upload_to_file_bed
+from modules.file_uploader import upload_to_file_bed, close_client as close_file_bed_client
+from modules.jsonc_utils import strip_jsonc_comments, write_file_atomic
 
 
 # --- 基础配置 ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# --- JSON 辅助函数 ---
+def _json_dumps(obj, ensure_ascii: bool = False) -> str:
+    """
+    将对象序列化为 JSON 字符串，优先使用 orjson。
+    默认保留非 ASCII 字符；ensure_ascii=True 时与 json.dumps 默认行为一致（转义为 \\uXXXX）。
+    orjson 拒绝的输入（如孤立代理字符、超过 64 位的整数）退回标准库，并按 ASCII 转义输出以保证结果可编码。
+    """
+    if orjson is not None and not ensure_ascii:
+        try:
+            return orjson.dumps(obj).decode('utf-8')
+        except TypeError:
+            return json.dumps(obj)
+    return json.dumps(obj, ensure_ascii=ensure_ascii)
+
+def _json_dumps_bytes(obj) -> bytes:
+    """将对象序列化为 UTF-8 JSON 字节，可直接作为响应体，优先使用 orjson；orjson 拒绝的输入退回标准库。"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            return json.dumps(obj).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+def _json_dumps_pretty(obj) -> bytes:
+    """将对象序列化为带 2 空格缩进的 UTF-8 JSON 字节，用于写入文件，优先使用 orjson；orjson 拒绝的输入退回标准库。"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        except TypeError:
+            return json.dumps(obj, indent=2).encode('utf-8')
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+def _json_loads(data):
+    """
+    解析 JSON 字符串或 UTF-8 字节（可直接传入文件内容而无需先解码），优先使用 orjson。
+    orjson 拒绝而标准库接受的输入（如 NaN、超过 64 位的整数）退回 json.loads；
+    确实无效的 JSON 抛出 json.JSONDecodeError。
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return json.loads(data)
+    return json.loads(data)
+
 # --- 全局状态与配置 ---
 CONFIG = {} # 存储从 config.jsonc 加载的配置
+_CONFIG_HASH = None # 上次成功解析的 config.jsonc 内容的 SHA-256 摘要
+_CONFIG_STAT = None # 上次检查时 config.jsonc 的 (修改时间纳秒, 文件大小)
 # browser_ws 用于存储与单个油猴脚本的 WebSocket 连接。
 # 注意：此架构假定只有一个浏览器标签页在工作。
 # 如果需要支持多个并发标签页，需要将此扩展为字典管理多个连接。
@@ -40,30 +92,56 @@ browser_ws: WebSocket | None = None
 # response_channels 用于存储每个 API 请求的响应队列。
 # 键是 request_id，值是 asyncio.Queue。
 response_channels: dict[str, asyncio.Queue] = {}
-last_activity_time = None # 记录最后一次活动的时间
+last_activity_time = None # 记录最后一次活动的时间（time.monotonic() 时间戳，不受系统时钟调整影响）
 idle_monitor_thread = None # 空闲监控线程
 main_event_loop = None # 主事件循环
 # 新增：用于跟踪是否因人机验证而刷新
 IS_REFRESHING_FOR_VERIFICATION = False
+# 处理浏览器数据流时，每轮最多合并的已到达数据块数量
+MAX_COALESCED_CHUNKS = 16
+# 空闲监控线程在未到超时时刻时，两次检查之间的最长间隔（秒）
+IDLE_MONITOR_RECHECK_SECONDS = 60
+# 启用文件床时，单个请求内同时上传的附件数量上限
+FILE_BED_MAX_CONCURRENT_UPLOADS = 4
 
 
 # --- 模型映射 ---
 # MODEL_NAME_TO_ID_MAP 现在将存储更丰富的对象： { "model_name": {"id": "...", "type": "..."} }
 MODEL_NAME_TO_ID_MAP = {}
+MODEL_LIST_DATA = [] # /v1/models 返回的模型条目，在加载 models.json 时生成
 MODEL_ENDPOINT_MAP = {} # 新增：用于存储模型到 session/message ID 的映射
 DEFAULT_MODEL_ID = None # 默认模型id: None
 
+def _normalize_endpoint_map(raw_map) -> dict:
+    """
+    将端点映射统一为 { "model_name": [映射字典, ...] } 的形式。
+    兼容旧格式（单个字典），并丢弃无效条目，使请求处理时无需再逐条判断类型。
+    """
+    if not isinstance(raw_map, dict):
+        return {}
+    normalized = {}
+    for model_name, entry in raw_map.items():
+        if isinstance(entry, dict):
+            mappings = [entry]
+        elif isinstance(entry, list):
+            mappings = [mapping for mapping in entry if isinstance(mapping, dict)]
+        else:
+            mappings = []
+        if mappings:
+            normalized[model_name] = mappings
+    return normalized
+
 def load_model_endpoint_map():
     """从 model_endpoint_map.json 加载模型到端点的映射。"""
     global MODEL_ENDPOINT_MAP
     try:
-        with open('model_endpoint_map.json', 'r', encoding='utf-8') as f:
+        with open('model_endpoint_map.json', 'rb') as f:
             content = f.read()
             # 允许空文件
             if not content.strip():
                 MODEL_ENDPOINT_MAP = {}
             else:
-                MODEL_ENDPOINT_MAP = json.loads(content)
+                MODEL_ENDPOINT_MAP = _normalize_endpoint_map(_json_loads(content))
         logger.info(f"成功从 'model_endpoint_map.json' 加载了 {len(MODEL_ENDPOINT_MAP)} 个模型端点映射。")
     except FileNotFoundError:
         logger.warning("'model_endpoint_map.json' 文件未找到。将使用空映射。")
@@ -76,41 +154,29 @@ def _parse_jsonc(jsonc_string: str) -> dict:
     """
     稳健地解析 JSONC 字符串，移除注释。
     """
-    lines = jsonc_string.splitlines()
-    no_comments_lines = []
-    in_block_comment = False
-    for line in lines:
-        stripped_line = line.strip()
-        if in_block_comment:
-            if '*/' in stripped_line:
-                in_block_comment = False
-                line = stripped_line.split('*/', 1)[1]
-            else:
-                continue
-        
-        if '/*' in line and not in_block_comment:
-            before_comment, _, after_comment = line.partition('/*')
-            if '*/' in after_comment:
-                _, _, after_block = after_comment.partition('*/')
-                line = before_comment + after_block
-            else:
-                line = before_comment
-                in_block_comment = True
-
-        if line.strip().startswith('//'):
-            continue
-        
-        no_comments_lines.append(line)
-
-    return json.loads("\n".join(no_comments_lines))
+    return _json_loads(strip_jsonc_comments(jsonc_string))
 
 def load_config():
-    """从 config.jsonc 加载配置，并处理 JSONC 注释。"""
-    global CONFIG
+    """
+    从 config.jsonc 加载配置，并处理 JSONC 注释。
+    每个 API 请求都会调用此函数：文件的修改时间和大小未变化时直接跳过读取；
+    读取后若内容哈希未变化，则沿用已解析的配置。
+    """
+    global CONFIG, _CONFIG_HASH, _CONFIG_STAT
     try:
-        with open('config.jsonc', 'r', encoding='utf-8') as f:
-            content = f.read()
-        CONFIG = _parse_jsonc(content)
+        st = os.stat('config.jsonc')
+        config_stat = (st.st_mtime_ns, st.st_size)
+        if config_stat == _CONFIG_STAT:
+            return
+        with open('config.jsonc', 'rb') as f:
+            raw = f.read()
+        config_hash = hashlib.sha256(raw).digest()
+        if config_hash == _CONFIG_HASH:
+            _CONFIG_STAT = config_stat
+            return
+        CONFIG = _parse_jsonc(raw.decode('utf-8'))
+        _CONFIG_HASH = config_hash
+        _CONFIG_STAT = config_stat
         logger.info("成功从 'config.jsonc' 加载配置。")
         # 打印关键配置状态
         logger.info(f"  - 酒馆模式 (Tavern Mode): {'✅ 启用' if CONFIG.get('tavern_mode_enabled') else '❌ 禁用'}")
@@ -118,13 +184,15 @@ def load_config():
     except (FileNotFoundError, json.JSONDecodeError) as e:
         logger.error(f"加载或解析 'config.jsonc' 失败: {e}。将使用默认配置。")
         CONFIG = {}
+        _CONFIG_HASH = None
+        _CONFIG_STAT = None
 
 def load_model_map():
     """从 models.json 加载模型映射，支持 'id:type' 格式。"""
-    global MODEL_NAME_TO_ID_MAP
+    global MODEL_NAME_TO_ID_MAP, MODEL_LIST_DATA
     try:
-        with open('models.json', 'r', encoding='utf-8') as f:
-            raw_map = json.load(f)
+        with open('models.json', 'rb') as f:
+            raw_map = _json_loads(f.read())
             
         processed_map = {}
         for name, value in raw_map.items():
@@ -138,11 +206,18 @@ def load_model_map():
                 processed_map[name] = {"id": value, "type": "text"}
 
         MODEL_NAME_TO_ID_MAP = processed_map
+        # 预先构建 /v1/models 的模型条目，避免每次请求都重新生成
+        created = int(time.time())
+        MODEL_LIST_DATA = [
+            {"id": name, "object": "model", "created": created, "owned_by": "LMArenaBridge"}
+            for name in processed_map
+        ]
         logger.info(f"成功从 'models.json' 加载并解析了 {len(MODEL_NAME_TO_ID_MAP)} 个模型。")
 
     except (FileNotFoundError, json.JSONDecodeError) as e:
         logger.error(f"加载 'models.json' 失败: {e}。将使用空模型列表。")
         MODEL_NAME_TO_ID_MAP = {}
+        MODEL_LIST_DATA = []
 
 # --- 公告处理 ---
 def check_and_display_announcement():
@@ -152,8 +227,8 @@ def check_and_display_announcement():
         try:
             logger.info("="*60)
             logger.info("📢 检测到更新公告，内容如下:")
-            with open(announcement_file, 'r', encoding='utf-8') as f:
-                announcement = json.load(f)
+            with open(announcement_file, 'rb') as f:
+                announcement = _json_loads(f.read())
                 title = announcement.get("title", "公告")
                 content = announcement.get("content", [])
                 
@@ -175,24 +250,39 @@ def check_and_display_announcement():
 
 # --- 更新检查 ---
 GITHUB_REPO = "Lianues/LMArenaBridge"
+_http_session = None # 更新检查与下载共用的 requests 会话
+
+def _get_http_session():
+    """返回共享的 requests.Session，使更新检查与下载复用 keep-alive 连接。"""
+    global _http_session
+    if _http_session is None:
+        import requests
+        _http_session = requests.Session()
+    return _http_session
 
 def download_and_extract_update(version):
     """下载并解压最新版本到临时文件夹。"""
     update_dir = "update_temp"
-    if not os.path.exists(update_dir):
-        os.makedirs(update_dir)
+    os.makedirs(update_dir, exist_ok=True)
+
+    # 需要导入 zipfile、tempfile 和 requests
+    import zipfile
+    import tempfile
+    import requests
 
     try:
         zip_url = f"https://github.com/{GITHUB_REPO}/archive/refs/heads/main.zip"
         logger.info(f"正在从 {zip_url} 下载新版本...")
-        response = requests.get(zip_url, timeout=60)
-        response.raise_for_status()
-
-        # 需要导入 zipfile 和 io
-        import zipfile
-        import io
-        with zipfile.ZipFile(io.BytesIO(response.content)) as z:
-            z.extractall(update_dir)
+        with _get_http_session().get(zip_url, timeout=60, stream=True) as response:
+            response.raise_for_status()
+
+            # 流式写入有上限的缓冲区，超过 1MB 时自动溢出到磁盘，避免整个压缩包常驻内存
+            with tempfile.SpooledTemporaryFile(max_size=1 << 20) as buffer:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    buffer.write(chunk)
+                buffer.seek(0)
+                with zipfile.ZipFile(buffer) as z:
+                    z.extractall(update_dir)
         
         logger.info(f"新版本已成功下载并解压到 '{update_dir}' 文件夹。")
         return True
@@ -211,18 +301,19 @@ def check_for_updates():
         logger.info("自动更新已禁用，跳过检查。")
         return
 
+    # 仅在需要检查更新时才导入网络与版本解析相关的依赖
+    import requests
+    from packaging.version import parse as parse_version
+
     current_version = CONFIG.get("version", "0.0.0")
     logger.info(f"当前版本: {current_version}。正在从 GitHub 检查更新...")
 
     try:
         config_url = f"https://raw.githubusercontent.com/{GITHUB_REPO}/main/config.jsonc"
-        response = requests.get(config_url, timeout=10)
+        response = _get_http_session().get(config_url, timeout=10)
         response.raise_for_status()
 
-        jsonc_content = response.text
-        remote_config = _parse_jsonc(jsonc_content)
-        
-        remote_version_str = remote_config.get("version")
+        remote_version_str = _parse_jsonc(response.text).get("version")
         if not remote_version_str:
             logger.warning("远程配置文件中未找到版本号，跳过更新检查。")
             return
@@ -254,6 +345,10 @@ def check_for_updates():
         logger.error(f"检查更新时发生未知错误: {e}")
 
 # --- 模型更新 ---
+# 页面源码中转义后的模型 JSON 对象的起始特征
+MODEL_JSON_START_PATTERN = re.compile(r'\{\\"id\\":\\"[a-f0-9-]+\\"')
+BRACE_PATTERN = re.compile(r'[{}]')
+
 def extract_models_from_html(html_content):
     """
     从 HTML 内容中提取完整的模型JSON对象，使用括号匹配确保完整性。
@@ -262,7 +357,7 @@ def extract_models_from_html(html_content):
     model_names = set()
     
     # 查找所有可能的模型JSON对象的起始位置
-    for start_match in re.finditer(r'\{\\"id\\":\\"[a-f0-9-]+\\"', html_content):
+    for start_match in MODEL_JSON_START_PATTERN.finditer(html_content):
         start_index = start_match.start()
         
         # 从起始位置开始，进行花括号匹配
@@ -272,13 +367,14 @@ def extract_models_from_html(html_content):
         # 优化：设置一个合理的搜索上限，避免无限循环
         search_limit = start_index + 10000 # 假设一个模型定义不会超过10000个字符
         
-        for i in range(start_index, min(len(html_content), search_limit)):
-            if html_content[i] == '{':
+        # 只跳到花括号所在位置进行计数，由正则引擎在 C 层扫描其余字符
+        for brace in BRACE_PATTERN.finditer(html_content, start_index, min(len(html_content), search_limit)):
+            if brace.group() == '{':
                 open_braces += 1
-            elif html_content[i] == '}':
+            else:
                 open_braces -= 1
                 if open_braces == 0:
-                    end_index = i + 1
+                    end_index = brace.end()
                     break
         
         if end_index != -1:
@@ -314,9 +410,8 @@ def save_available_models(new_models_list, models_path="available_models.json"):
     logger.info(f"检测到 {len(new_models_list)} 个模型，正在更新 '{models_path}'...")
     
     try:
-        with open(models_path, 'w', encoding='utf-8') as f:
-            # 直接将完整的模型对象列表写入文件
-            json.dump(new_models_list, f, indent=4, ensure_ascii=False)
+        # 先完整序列化为字节，再一次性原子写入文件
+        write_file_atomic(models_path, _json_dumps_pretty(new_models_list))
         logger.info(f"✅ '{models_path}' 已成功更新，包含 {len(new_models_list)} 个模型。")
     except IOError as e:
         logger.error(f"❌ 写入 '{models_path}' 文件时出错: {e}")
@@ -361,23 +456,25 @@ def idle_monitor():
     logger.info("空闲监控线程已启动。")
     
     while True:
+        # 默认在禁用状态下定期复查配置，以便感知配置变更
+        sleep_seconds = IDLE_MONITOR_RECHECK_SECONDS
         if CONFIG.get("enable_idle_restart", False):
             timeout = CONFIG.get("idle_restart_timeout_seconds", 300)
             
             # 如果超时设置为-1，则禁用重启检查
-            if timeout == -1:
-                time.sleep(10) # 仍然需要休眠以避免繁忙循环
-                continue
-
-            idle_time = (datetime.now() - last_activity_time).total_seconds()
-            
-            if idle_time > timeout:
-                logger.info(f"服务器空闲时间 ({idle_time:.0f}s) 已超过阈值 ({timeout}s)。")
-                restart_server()
-                break # 退出循环，因为进程即将被替换
+            if timeout != -1:
+                idle_time = time.monotonic() - last_activity_time
                 
-        # 每 10 秒检查一次
-        time.sleep(10)
+                if idle_time > timeout:
+                    logger.info(f"服务器空闲时间 ({idle_time:.0f}s) 已超过阈值 ({timeout}s)。")
+                    restart_server()
+                    break # 退出循环，因为进程即将被替换
+
+                # 直接休眠到预计的超时时刻，而不是固定间隔轮询；
+                # 期间若有新请求，醒来后会根据最新的活动时间重新计算。
+                sleep_seconds = min(timeout - idle_time, IDLE_MONITOR_RECHECK_SECONDS) + 1
+
+        time.sleep(sleep_seconds)
 
 # --- FastAPI 生命周期事件 ---
 @asynccontextmanager
@@ -397,16 +494,19 @@ async def lifespan(app: FastAPI):
     logger.info("  (可通过运行 id_updater.py 修改模式)")
     logger.info("="*60)
 
-    check_for_updates() # 检查程序更新
-    load_model_map() # 重新启用模型加载
-    load_model_endpoint_map() # 加载模型端点映射
+    # 更新检查需要访问网络，与本地模型文件的加载放在线程池中并发执行
+    await asyncio.gather(
+        asyncio.to_thread(check_for_updates), # 检查程序更新
+        asyncio.to_thread(load_model_map), # 重新启用模型加载
+        asyncio.to_thread(load_model_endpoint_map), # 加载模型端点映射
+    )
     logger.info("服务器启动完成。等待油猴脚本连接...")
 
     # 检查并显示公告，放在启动信息的最后，使其更显眼
     check_and_display_announcement()
 
     # 在模型更新后，标记活动时间的起点
-    last_activity_time = datetime.now()
+    last_activity_time = time.monotonic()
     
     # 启动空闲监控线程
     if CONFIG.get("enable_idle_restart", False):
@@ -415,6 +515,7 @@ async def lifespan(app: FastAPI):
         
 
     yield
+    await close_file_bed_client() # 关闭文件床共享 HTTP 客户端
     logger.info("服务器正在关闭。")
 
 app = FastAPI(lifespan=lifespan)
@@ -429,6 +530,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- GZip 压缩中间件 ---
+# 仅压缩超过 1KB 的响应（如非流式补全和模型列表），小数据块不值得承担 gzip 的固定开销。
+# 注意：依赖 starlette>=0.46，旧版本会压缩 text/event-stream，导致流式输出被缓冲到结束才发送。
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # --- 辅助函数 ---
 def save_config():
     """将当前的 CONFIG 对象写回 config.jsonc 文件，保留注释。"""
@@ -452,8 +558,7 @@ def save_config():
         content_str = replacer("session_id", CONFIG["session_id"], content_str)
         content_str = replacer("message_id", CONFIG["message_id"], content_str)
         
-        with open('config.jsonc', 'w', encoding='utf-8') as f:
-            f.write(content_str)
+        write_file_atomic('config.jsonc', content_str)
         logger.info("✅ 成功将会话信息更新到 config.jsonc。")
     except Exception as e:
         logger.error(f"❌ 写入 config.jsonc 时发生错误: {e}", exc_info=True)
@@ -535,8 +640,14 @@ async def convert_openai_to_lmarena_payload(openai_data: dict, session_id: str,
 
     # 2. 应用酒馆模式 (Tavern Mode)
     if CONFIG.get("tavern_mode_enabled"):
-        system_prompts = [msg['content'] for msg in processed_messages if msg['role'] == 'system']
-        other_messages = [msg for msg in processed_messages if msg['role'] != 'system']
+        # 单次遍历同时拆分出系统提示和其余消息
+        system_prompts = []
+        other_messages = []
+        for msg in processed_messages:
+            if msg['role'] == 'system':
+                system_prompts.append(msg['content'])
+            else:
+                other_messages.append(msg)
         
         merged_system_prompt = "\n\n".join(system_prompts)
         final_messages = []
@@ -574,11 +685,10 @@ async def convert_openai_to_lmarena_payload(openai_data: dict, session_id: str,
     if message_templates and message_templates[-1]["role"] == "user":
         last_msg = message_templates[-1]
         if last_msg["content"].strip().endswith("--bypass") and last_msg.get("attachments"):
-            has_images = False
-            for attachment in last_msg.get("attachments", []):
-                if attachment.get("contentType", "").startswith("image/"):
-                    has_images = True
-                    break
+            has_images = any(
+                attachment.get("contentType", "").startswith("image/")
+                for attachment in last_msg.get("attachments", [])
+            )
             
             if has_images:
                 logger.info("检测到--bypass标记和图片附件，构造虚假助手消息")
@@ -647,23 +757,32 @@ async def convert_openai_to_lmarena_payload(openai_data: dict, session_id: str,
     }
 
 # --- OpenAI 格式化辅助函数 (确保JSON序列化稳健) ---
-def format_openai_chunk(content: str, model: str, request_id: str) -> str:
-    """格式化为 OpenAI 流式块。"""
-    chunk = {
+def _build_openai_chunk(model: str, request_id: str, delta: dict, finish_reason: str | None = None) -> dict:
+    """构建 OpenAI 流式块对象。所有流式块的结构只在此处定义。"""
+    return {
         "id": request_id, "object": "chat.completion.chunk",
         "created": int(time.time()), "model": model,
-        "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}]
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
     }
-    return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+def format_openai_chunk(content: str, model: str, request_id: str) -> str:
+    """格式化为 OpenAI 流式块。"""
+    return f"data: {_json_dumps(_build_openai_chunk(model, request_id, {'content': content}))}\n\n"
+
+def _build_openai_chunk_template(model: str, request_id: str) -> tuple[str, str]:
+    """
+    预先序列化流式内容块中不变的部分，返回 (前缀, 后缀)。
+    同一个流的内容块只有 delta.content 不同，因此每个块只需编码 content 字符串本身。
+    占位符只含字母、数字和下划线，序列化时总是原样输出，可直接按它切分。
+    """
+    placeholder = f"__content_{uuid.uuid4().hex}__"
+    chunk = _build_openai_chunk(model, request_id, {"content": placeholder})
+    prefix, suffix = _json_dumps(chunk).split(f'"{placeholder}"')
+    return f"data: {prefix}", f"{suffix}\n\n"
 
 def format_openai_finish_chunk(model: str, request_id: str, reason: str = 'stop') -> str:
     """格式化为 OpenAI 结束块。"""
-    chunk = {
-        "id": request_id, "object": "chat.completion.chunk",
-        "created": int(time.time()), "model": model,
-        "choices": [{"index": 0, "delta": {}, "finish_reason": reason}]
-    }
-    return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\ndata: [DONE]\n\n"
+    return f"data: {_json_dumps(_build_openai_chunk(model, request_id, {}, reason))}\n\ndata: [DONE]\n\n"
 
 def format_openai_error_chunk(error_message: str, model: str, request_id: str) -> str:
     """格式化为 OpenAI 错误块。"""
@@ -689,6 +808,18 @@ def format_openai_non_stream_response(content: str, model: str, request_id: str,
         },
     }
 
+# 附件过大时返回给客户端的错误信息；非流式响应据此直接判断 413 状态码
+ATTACHMENT_TOO_LARGE_ERROR = "上传失败：附件大小超过了 LMArena 服务器的限制 (通常是 5MB左右)。请尝试压缩文件或上传更小的文件。"
+
+# LMArena 数据流解析所用的正则表达式，在模块加载时预编译一次
+# 文本 (a0/b0) 与图片 (a2/b2) 合并为一个正则，按数据流中的先后顺序依次匹配：
+# 第 1 组为文本内容，第 2 组为图片 JSON 列表
+CONTENT_PATTERN = re.compile(r'[ab]0:"((?:\\.|[^"\\])*)"|[ab]2:(\[.*?\])')
+FINISH_PATTERN = re.compile(r'[ab]d:(\{.*?"finishReason".*?\})')
+ERROR_PATTERN = re.compile(r'(\{\s*"error".*?\})', re.DOTALL)
+# Cloudflare 人机验证页面的特征，合并为一个正则以便单次扫描
+CLOUDFLARE_PATTERN = re.compile(r'<title>Just a moment...</title>|Enable JavaScript and cookies to continue', re.IGNORECASE)
+
 async def _process_lmarena_stream(request_id: str):
     """
     核心内部生成器：处理来自浏览器的原始数据流，并产生结构化事件。
@@ -703,23 +834,21 @@ async def _process_lmarena_stream(request_id: str):
 
     buffer = ""
     timeout = CONFIG.get("stream_response_timeout_seconds",360)
-    text_pattern = re.compile(r'[ab]0:"((?:\\.|[^"\\])*)"')
-    # 新增：用于匹配和提取图片URL的正则表达式
-    image_pattern = re.compile(r'[ab]2:(\[.*?\])')
-    finish_pattern = re.compile(r'[ab]d:(\{.*?"finishReason".*?\})')
-    error_pattern = re.compile(r'(\{\s*"error".*?\})', re.DOTALL)
-    cloudflare_patterns = [r'<title>Just a moment...</title>', r'Enable JavaScript and cookies to continue']
     
     has_yielded_content = False # 标记是否已产出过有效内容
+    pending_data = None # 合并数据块时遇到的错误或 [DONE] 信号，留到下一轮处理
 
     try:
         while True:
-            try:
-                raw_data = await asyncio.wait_for(queue.get(), timeout=timeout)
-            except asyncio.TimeoutError:
-                logger.warning(f"PROCESSOR [ID: {request_id[:8]}]: 等待浏览器数据超时（{timeout}秒）。")
-                yield 'error', f'Response timed out after {timeout} seconds.'
-                return
+            if pending_data is not None:
+                raw_data, pending_data = pending_data, None
+            else:
+                try:
+                    raw_data = await asyncio.wait_for(queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    logger.warning(f"PROCESSOR [ID: {request_id[:8]}]: 等待浏览器数据超时（{timeout}秒）。")
+                    yield 'error', f'Response timed out after {timeout} seconds.'
+                    return
 
             # --- Cloudflare 人机验证处理 ---
             def handle_cloudflare_verification():
@@ -739,11 +868,11 @@ async def _process_lmarena_stream(request_id: str):
                 error_msg = raw_data.get('error', 'Unknown browser error')
                 if isinstance(error_msg, str):
                     if '413' in error_msg or 'too large' in error_msg.lower():
-                        friendly_error_msg = "上传失败：附件大小超过了 LMArena 服务器的限制 (通常是 5MB左右)。请尝试压缩文件或上传更小的文件。"
+                        friendly_error_msg = ATTACHMENT_TOO_LARGE_ERROR
                         logger.warning(f"PROCESSOR [ID: {request_id[:8]}]: 检测到附件过大错误 (413)。")
                         yield 'error', friendly_error_msg
                         return
-                    if any(re.search(p, error_msg, re.IGNORECASE) for p in cloudflare_patterns):
+                    if CLOUDFLARE_PATTERN.search(error_msg):
                         yield 'error', handle_cloudflare_verification()
                         return
                 yield 'error', error_msg
@@ -759,42 +888,62 @@ async def _process_lmarena_stream(request_id: str):
             # 3. 累加缓冲区并检查内容
             buffer += "".join(str(item) for item in raw_data) if isinstance(raw_data, list) else raw_data
 
-            if any(re.search(p, buffer, re.IGNORECASE) for p in cloudflare_patterns):
+            # 合并队列中已到达的后续数据块，一次性解析，减少逐块的正则扫描和 SSE 输出次数
+            for _ in range(MAX_COALESCED_CHUNKS - 1):
+                if queue.empty():
+                    break
+                next_data = queue.get_nowait()
+                if isinstance(next_data, dict) or next_data == "[DONE]":
+                    pending_data = next_data
+                    break
+                buffer += "".join(str(item) for item in next_data) if isinstance(next_data, list) else next_data
+
+            if CLOUDFLARE_PATTERN.search(buffer):
                 yield 'error', handle_cloudflare_verification()
                 return
             
-            if (error_match := error_pattern.search(buffer)):
+            if (error_match := ERROR_PATTERN.search(buffer)):
                 try:
                     error_json = json.loads(error_match.group(1))
                     yield 'error', error_json.get("error", "来自 LMArena 的未知错误")
                     return
                 except json.JSONDecodeError: pass
 
-            # 优先处理文本内容
-            while (match := text_pattern.search(buffer)):
-                try:
-                    text_content = json.loads(f'"{match.group(1)}"')
-                    if text_content:
-                        has_yielded_content = True
-                        yield 'content', text_content
-                except (ValueError, json.JSONDecodeError): pass
-                buffer = buffer[match.end():]
-
-            # 新增：处理图片内容
-            while (match := image_pattern.search(buffer)):
+            # 按数据流顺序处理文本和图片，相邻的文本合并为一个内容块产出
+            # 通过记录扫描位置推进，循环结束后只切片一次，避免每次匹配都复制剩余缓冲区
+            text_parts = []
+            pos = 0
+            while (match := CONTENT_PATTERN.search(buffer, pos)):
+                pos = match.end()
+                if match.group(1) is not None:
+                    try:
+                        text_content = _json_loads(f'"{match.group(1)}"')
+                        if text_content:
+                            text_parts.append(text_content)
+                    except (ValueError, json.JSONDecodeError): pass
+                    continue
+
+                # 处理图片内容：先产出之前累积的文本，保持原有顺序
                 try:
-                    image_data_list = json.loads(match.group(1))
+                    image_data_list = json.loads(match.group(2))
                     if isinstance(image_data_list, list) and image_data_list:
                         image_info = image_data_list[0]
                         if image_info.get("type") == "image" and "image" in image_info:
+                            if text_parts:
+                                has_yielded_content = True
+                                yield 'content', "".join(text_parts)
+                                text_parts = []
                             # 将URL包装成Markdown格式并作为内容块yield
                             markdown_image = f"![Image]({image_info['image']})"
                             yield 'content', markdown_image
                 except (json.JSONDecodeError, IndexError) as e:
-                    logger.warning(f"解析图片URL时出错: {e}, buffer: {buffer[:150]}")
-                buffer = buffer[match.end():]
+                    logger.warning(f"解析图片URL时出错: {e}, buffer: {buffer[match.start():match.start() + 150]}")
+            buffer = buffer[pos:]
+            if text_parts:
+                has_yielded_content = True
+                yield 'content', "".join(text_parts)
 
-            if (finish_match := finish_pattern.search(buffer)):
+            if (finish_match := FINISH_PATTERN.search(buffer)):
                 try:
                     finish_data = json.loads(finish_match.group(1))
                     yield 'finish', finish_data.get("finishReason", "stop")
@@ -815,15 +964,20 @@ async def stream_generator(request_id: str, model: str):
     
     finish_reason_to_send = 'stop'  # 默认的结束原因
 
+    chunk_prefix, chunk_suffix = _build_openai_chunk_template(model, response_id)
+
+    def format_content_chunk(content: str) -> str:
+        return f"{chunk_prefix}{_json_dumps(content)}{chunk_suffix}"
+
     async for event_type, data in _process_lmarena_stream(request_id):
         if event_type == 'content':
-            yield format_openai_chunk(data, model, response_id)
+            yield format_content_chunk(data)
         elif event_type == 'finish':
             # 记录结束原因，但不要立即返回，等待浏览器发送 [DONE]
             finish_reason_to_send = data
             if data == 'content-filter':
                 warning_msg = "\n\n响应被终止，可能是上下文超限或者模型内部审查（大概率）的原因"
-                yield format_openai_chunk(warning_msg, model, response_id)
+                yield format_content_chunk(warning_msg)
         elif event_type == 'error':
             logger.error(f"STREAMER [ID: {request_id[:8]}]: 流中发生错误: {data}")
             yield format_openai_error_chunk(str(data), model, response_id)
@@ -854,7 +1008,7 @@ async def non_stream_response(request_id: str, model: str):
             logger.error(f"NON-STREAM [ID: {request_id[:8]}]: 处理时发生错误: {data}")
             
             # 统一流式和非流式响应的错误状态码
-            status_code = 413 if "附件大小超过了" in str(data) else 500
+            status_code = 413 if data == ATTACHMENT_TOO_LARGE_ERROR else 500
 
             error_response = {
                 "error": {
@@ -863,13 +1017,13 @@ async def non_stream_response(request_id: str, model: str):
                     "code": "attachment_too_large" if status_code == 413 else "processing_error"
                 }
             }
-            return Response(content=json.dumps(error_response, ensure_ascii=False), status_code=status_code, media_type="application/json")
+            return Response(content=_json_dumps_bytes(error_response), status_code=status_code, media_type="application/json")
 
     final_content = "".join(full_content)
     response_data = format_openai_non_stream_response(final_content, model, response_id, reason=finish_reason)
     
     logger.info(f"NON-STREAM [ID: {request_id[:8]}]: 响应聚合完成。")
-    return Response(content=json.dumps(response_data, ensure_ascii=False), media_type="application/json")
+    return Response(content=_json_dumps_bytes(response_data), media_type="application/json")
 
 # --- WebSocket 端点 ---
 @app.websocket("/ws")
@@ -891,7 +1045,7 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             # 等待并接收来自油猴脚本的消息
             message_str = await websocket.receive_text()
-            message = json.loads(message_str)
+            message = _json_loads(message_str)
             
             request_id = message.get("request_id")
             data = message.get("data")
@@ -930,15 +1084,7 @@ async def get_models():
     
     return {
         "object": "list",
-        "data": [
-            {
-                "id": model_name, 
-                "object": "model",
-                "created": int(time.time()),
-                "owned_by": "LMArenaBridge"
-            }
-            for model_name in MODEL_NAME_TO_ID_MAP.keys()
-        ],
+        "data": MODEL_LIST_DATA,
     }
 
 @app.post("/internal/request_model_update")
@@ -995,8 +1141,8 @@ async def chat_completions(request: Request):
     通过 WebSocket 发送给油猴脚本，然后流式返回结果。
     """
     global last_activity_time
-    last_activity_time = datetime.now() # 更新活动时间
-    logger.info(f"API请求已收到，活动时间已更新为: {last_activity_time.strftime('%Y-%m-%d %H:%M:%S')}")
+    last_activity_time = time.monotonic() # 更新活动时间
+    logger.info(f"API请求已收到，活动时间已更新为: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
     try:
         openai_req = await request.json()
@@ -1053,15 +1199,13 @@ async def chat_completions(request: Request):
     mode_override, battle_target_override = None, None
 
     if model_name and model_name in MODEL_ENDPOINT_MAP:
-        mapping_entry = MODEL_ENDPOINT_MAP[model_name]
-        selected_mapping = None
-
-        if isinstance(mapping_entry, list) and mapping_entry:
-            selected_mapping = random.choice(mapping_entry)
+        # 加载时已统一为非空的映射字典列表
+        mappings = MODEL_ENDPOINT_MAP[model_name]
+        selected_mapping = random.choice(mappings)
+        if len(mappings) > 1:
             logger.info(f"为模型 '{model_name}' 从ID列表中随机选择了一个映射。")
-        elif isinstance(mapping_entry, dict):
-            selected_mapping = mapping_entry
-            logger.info(f"为模型 '{model_name}' 找到了单个端点映射（旧格式）。")
+        else:
+            logger.info(f"为模型 '{model_name}' 找到了单个端点映射。")
         
         if selected_mapping:
             session_id = selected_mapping.get("session_id")
@@ -1110,40 +1254,55 @@ async def chat_completions(request: Request):
         # --- 附件预处理（包括文件床上传） ---
         # 在与浏览器通信前，先处理好所有附件。如果失败，则立即返回错误。
         messages_to_process = openai_req.get("messages", [])
-        for message in messages_to_process:
-            content = message.get("content")
-            if isinstance(content, list):
-                for i, part in enumerate(content):
-                    if part.get("type") == "image_url" and CONFIG.get("file_bed_enabled"):
-                        image_url_data = part.get("image_url", {})
-                        base64_url = image_url_data.get("url")
-                        original_filename = image_url_data.get("detail")
-                        
-                        if not (base64_url and base64_url.startswith("data:")):
-                            raise ValueError(f"无效的图片数据格式: {base64_url[:100] if base64_url else 'None'}")
-
-                        upload_url = CONFIG.get("file_bed_upload_url")
-                        if not upload_url:
-                            raise ValueError("文件床已启用，但 'file_bed_upload_url' 未配置。")
-                        
-                        # 确保处理转义的斜杠
-                        upload_url = upload_url.replace('\\/', '/')
-
-                        api_key = CONFIG.get("file_bed_api_key")
-                        file_name = original_filename or f"image_{uuid.uuid4()}.png"
-                        
-                        logger.info(f"文件床预处理：正在上传 '{file_name}'...")
-                        uploaded_filename, error_message = await upload_to_file_bed(file_name, base64_url, upload_url, api_key)
-
-                        if error_message:
-                            raise IOError(f"文件床上传失败: {error_message}")
-                        
-                        # 根据您的建议，使用 config 中的 URL 前缀构建最终 URL
-                        url_prefix = upload_url.rsplit('/', 1)[0]
-                        final_url = f"{url_prefix}/uploads/{uploaded_filename}"
-                        
-                        part["image_url"]["url"] = final_url
-                        logger.info(f"附件URL已成功替换为: {final_url}")
+        parts_to_upload = []
+        if CONFIG.get("file_bed_enabled"):
+            for message in messages_to_process:
+                content = message.get("content")
+                if isinstance(content, list):
+                    parts_to_upload.extend(part for part in content if part.get("type") == "image_url")
+
+        if parts_to_upload:
+            upload_url = CONFIG.get("file_bed_upload_url")
+            if not upload_url:
+                raise ValueError("文件床已启用，但 'file_bed_upload_url' 未配置。")
+            
+            # 确保处理转义的斜杠
+            upload_url = upload_url.replace('\\/', '/')
+            api_key = CONFIG.get("file_bed_api_key")
+            # 根据您的建议，使用 config 中的 URL 前缀构建最终 URL
+            url_prefix = upload_url.rsplit('/', 1)[0]
+
+            for part in parts_to_upload:
+                base64_url = part.get("image_url", {}).get("url")
+                if not (base64_url and base64_url.startswith("data:")):
+                    raise ValueError(f"无效的图片数据格式: {base64_url[:100] if base64_url else 'None'}")
+
+            # 多个附件并发上传，用信号量限制同时进行的上传数量
+            upload_semaphore = asyncio.Semaphore(FILE_BED_MAX_CONCURRENT_UPLOADS)
+
+            async def upload_part(part):
+                image_url_data = part["image_url"]
+                file_name = image_url_data.get("detail") or f"image_{uuid.uuid4()}.png"
+                async with upload_semaphore:
+                    logger.info(f"文件床预处理：正在上传 '{file_name}'...")
+                    uploaded_filename, error_message = await upload_to_file_bed(file_name, image_url_data["url"], upload_url, api_key)
+
+                if error_message:
+                    raise IOError(f"文件床上传失败: {error_message}")
+                
+                final_url = f"{url_prefix}/uploads/{uploaded_filename}"
+                image_url_data["url"] = final_url
+                logger.info(f"附件URL已成功替换为: {final_url}")
+
+            upload_tasks = [asyncio.create_task(upload_part(part)) for part in parts_to_upload]
+            try:
+                await asyncio.gather(*upload_tasks)
+            except BaseException:
+                # 任一上传失败（或请求被取消）时，取消其余仍在进行的上传，避免在返回错误后继续上传并修改请求内容
+                for task in upload_tasks:
+                    task.cancel()
+                await asyncio.gather(*upload_tasks, return_exceptions=True)
+                raise
 
         # 1. 转换请求 (此时已不包含需要上传的附件)
         lmarena_payload = await convert_openai_to_lmarena_payload(
@@ -1166,7 +1325,7 @@ async def chat_completions(request: Request):
         
         # 3. 通过 WebSocket 发送
         logger.info(f"API CALL [ID: {request_id[:8]}]: 正在通过 WebSocket 发送载荷到油猴脚本。")
-        await browser_ws.send_text(json.dumps(message_to_browser))
+        await browser_ws.send_text(_json_dumps(message_to_browser, ensure_ascii=True))
 
         # 4. 根据 stream 参数决定返回类型
         is_stream = openai_req.get("stream", False)
@@ -1224,6 +1383,7 @@ async def start_id_capture():
 
 # --- 主程序入口 ---
 if __name__ == "__main__":
+    import uvicorn
     # 建议从 config.jsonc 中读取端口，此处为临时硬编码
     api_port = 5102
     logger.info(f"🚀 LMArena Bridge v2.0 API 服务器正在启动...")
@@ -10,7 +10,10 @@ import json
 import re
 import threading
 import os
-import requests
+import urllib.request
+import urllib.error
+
+from modules.jsonc_utils import strip_jsonc_comments, write_file_atomic
 
 # --- 配置 ---
 HOST = "127.0.0.1"
@@ -24,35 +27,10 @@ def read_config():
         return None
     try:
         with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+            content = f.read()
         
-        # 更稳健地移除注释，逐行处理以避免错误删除URL中的 "//"
-        no_comments_lines = []
-        in_block_comment = False
-        for line in lines:
-            stripped_line = line.strip()
-            if in_block_comment:
-                if '*/' in stripped_line:
-                    in_block_comment = False
-                    line = stripped_line.split('*/', 1)[1]
-                else:
-                    continue
-            
-            if '/*' in line and not in_block_comment:
-                before_comment, _, after_comment = line.partition('/*')
-                if '*/' in after_comment:
-                    _, _, after_block = after_comment.partition('*/')
-                    line = before_comment + after_block
-                else:
-                    line = before_comment
-                    in_block_comment = True
-
-            if line.strip().startswith('//'):
-                continue
-            
-            no_comments_lines.append(line)
-
-        json_content = "".join(no_comments_lines)
+        # 用单个正则一次性移除注释，字符串（如 URL）中的 "//" 会被原样保留
+        json_content = strip_jsonc_comments(content)
         return json.loads(json_content)
     except Exception as e:
         print(f"❌ 读取或解析 '{CONFIG_PATH}' 时发生错误: {e}")
@@ -76,8 +54,7 @@ def save_config_value(key, value):
             print(f"🤔 警告: 未能在 '{CONFIG_PATH}' 中找到键 '{key}'。")
             return False
 
-        with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-            f.write(new_content)
+        write_file_atomic(CONFIG_PATH, new_content)
         return True
     except Exception as e:
         print(f"❌ 更新 '{CONFIG_PATH}' 时发生错误: {e}")
@@ -166,15 +143,15 @@ def notify_api_server():
     """通知主 API 服务器，ID 更新流程已开始。"""
     api_server_url = "http://127.0.0.1:5102/internal/start_id_capture"
     try:
-        response = requests.post(api_server_url, timeout=3)
-        if response.status_code == 200:
+        request = urllib.request.Request(api_server_url, data=b"", method="POST")
+        with urllib.request.urlopen(request, timeout=3):
             print("✅ 已成功通知主服务器激活ID捕获模式。")
             return True
-        else:
-            print(f"⚠️ 通知主服务器失败，状态码: {response.status_code}。")
-            print(f"   - 错误信息: {response.text}")
-            return False
-    except requests.ConnectionError:
+    except urllib.error.HTTPError as e:
+        print(f"⚠️ 通知主服务器失败，状态码: {e.code}。")
+        print(f"   - 错误信息: {e.read().decode('utf-8', errors='replace')}")
+        return False
+    except urllib.error.URLError:
         print("❌ 无法连接到主 API 服务器。请确保 api_server.py 正在运行。")
         return False
     except Exception as e:
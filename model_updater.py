@@ -1,5 +1,7 @@
 # model_updater.py
-import requests
+import json
+import urllib.request
+import urllib.error
 import time
 import logging
 
@@ -13,17 +15,18 @@ def trigger_model_update():
     """
     try:
         logging.info("正在向主服务器发送模型列表更新请求...")
-        response = requests.post(f"{API_SERVER_URL}/internal/request_model_update")
-        response.raise_for_status()
+        request = urllib.request.Request(f"{API_SERVER_URL}/internal/request_model_update", data=b"", method="POST")
+        with urllib.request.urlopen(request) as response:
+            result = json.loads(response.read())
         
-        if response.json().get("status") == "success":
+        if result.get("status") == "success":
             logging.info("✅ 已成功请求服务器更新模型列表。")
             logging.info("请确保 LMArena 页面已打开，脚本将自动从页面提取最新模型列表。")
             logging.info("服务器将把结果保存在 `available_models.json` 文件中。")
         else:
-            logging.error(f"❌ 服务器返回错误: {response.json().get('message')}")
+            logging.error(f"❌ 服务器返回错误: {result.get('message')}")
 
-    except requests.exceptions.RequestException as e:
+    except urllib.error.URLError as e:
         logging.error(f"❌ 无法连接到主服务器 ({API_SERVER_URL})。")
         logging.error("请确保 `api_server.py` 正在运行中。")
     except Exception as e:
@@ -1,5 +1,4 @@
 # modules/file_uploader.py
-import httpx
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,6 +7,28 @@ from typing import Tuple
 
 from typing import Tuple
 
+# 进程内共享的 HTTP 客户端，复用 keep-alive 连接，避免每次上传都重新进行 TCP/TLS 握手。
+# httpx 仅在启用文件床时才会用到，因此延迟到首次上传时再导入。
+_client: "httpx.AsyncClient | None" = None
+
+def _get_client() -> "httpx.AsyncClient":
+    """返回共享的 httpx.AsyncClient，首次调用时创建。"""
+    global _client
+    if _client is None or _client.is_closed:
+        import httpx
+        _client = httpx.AsyncClient(
+            timeout=60.0,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=32, keepalive_expiry=120),
+        )
+    return _client
+
+async def close_client():
+    """关闭共享的 HTTP 客户端，应在服务器关闭时调用。"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
 async def upload_to_file_bed(file_name: str, file_data: str, upload_url: str, api_key: str | None = None) -> Tuple[str | None, str | None]:
     """
     将 base64 编码的文件上传到文件床服务器。
@@ -19,6 +40,8 @@ async def upload_to_file_bed(file_name: str, file_data: str, upload_url: str, ap
     :return: 一个元组 (filename, error_message)。成功时 filename 是字符串，error_message 是 None；
              失败时 filename 是 None，error_message 是包含错误信息的字符串。
     """
+    import httpx
+
     payload = {
         "file_name": file_name,
         "file_data": file_data,
@@ -26,19 +49,18 @@ async def upload_to_file_bed(file_name: str, file_data: str, upload_url: str, ap
     }
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(upload_url, json=payload)
-            
-            response.raise_for_status()  # 如果状态码是 4xx 或 5xx，则引发异常
-            
-            result = response.json()
-            if result.get("success") and result.get("filename"):
-                logger.info(f"文件 '{file_name}' 成功上传到文件床，文件名为: {result['filename']}")
-                return result["filename"], None
-            else:
-                error_msg = result.get("error", "文件床返回了未知的错误。")
-                logger.error(f"上传到文件床失败: {error_msg}")
-                return None, error_msg
+        response = await _get_client().post(upload_url, json=payload)
+        
+        response.raise_for_status()  # 如果状态码是 4xx 或 5xx，则引发异常
+        
+        result = response.json()
+        if result.get("success") and result.get("filename"):
+            logger.info(f"文件 '{file_name}' 成功上传到文件床，文件名为: {result['filename']}")
+            return result["filename"], None
+        else:
+            error_msg = result.get("error", "文件床返回了未知的错误。")
+            logger.error(f"上传到文件床失败: {error_msg}")
+            return None, error_msg
                 
     except httpx.HTTPStatusError as e:
         error_details = f"HTTP 错误: {e.response.status_code} - {e.response.text}"
@@ -0,0 +1,36 @@
+# modules/jsonc_utils.py
+import os
+import re
+
+# 匹配 JSON 字符串或 // 与 /* */ 注释：字符串原样保留，注释被移除
+JSONC_TOKEN_PATTERN = re.compile(r'"(?:\\.|[^"\\])*"?|//[^\n]*|/\*[\s\S]*?\*/')
+
+def _strip_jsonc_comment(match: re.Match) -> str:
+    token = match.group(0)
+    return token if token.startswith('"') else ''
+
+def strip_jsonc_comments(jsonc_string: str) -> str:
+    """
+    移除 JSONC 字符串中的 // 与 /* */ 注释，返回可直接解析的 JSON 文本。
+    使用单个预编译正则一次性扫描，字符串中的 "//"（例如 URL）不会被误删。
+    """
+    return JSONC_TOKEN_PATTERN.sub(_strip_jsonc_comment, jsonc_string)
+
+def write_file_atomic(path: str, content: str | bytes):
+    """
+    先写入同目录下的临时文件，再用 os.replace 原子替换目标文件，
+    避免写入过程中断导致配置或模型文件被截断。str 内容以 UTF-8 文本模式写入。
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        if isinstance(content, bytes):
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+        else:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+        os.replace(tmp_path, path)
+    finally:
+        # 写入或替换失败时清理残留的临时文件
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -7,37 +7,14 @@ import sys
 import json
 import re
 
+# 本脚本以 `python modules/update_script.py` 方式独立运行，modules 目录即在 sys.path 中
+from jsonc_utils import strip_jsonc_comments, write_file_atomic
+
 def _parse_jsonc(jsonc_string: str) -> dict:
     """
     稳健地解析 JSONC 字符串，移除注释。
     """
-    lines = jsonc_string.splitlines()
-    no_comments_lines = []
-    in_block_comment = False
-    for line in lines:
-        stripped_line = line.strip()
-        if in_block_comment:
-            if '*/' in stripped_line:
-                in_block_comment = False
-                line = stripped_line.split('*/', 1)[1]
-            else:
-                continue
-        
-        if '/*' in line and not in_block_comment:
-            before_comment, _, after_comment = line.partition('/*')
-            if '*/' in after_comment:
-                _, _, after_block = after_comment.partition('*/')
-                line = before_comment + after_block
-            else:
-                line = before_comment
-                in_block_comment = True
-
-        if line.strip().startswith('//'):
-            continue
-        
-        no_comments_lines.append(line)
-
-    return json.loads("\n".join(no_comments_lines))
+    return json.loads(strip_jsonc_comments(jsonc_string))
 
 def load_jsonc_values(path):
     """从一个 .jsonc 文件中加载数据，忽略注释，只返回键值对。"""
@@ -145,7 +122,8 @@ def main():
             with open(new_config_template_path, 'r', encoding='utf-8') as f:
                 new_config_content = f.read()
 
-            new_version_values = load_jsonc_values(new_config_template_path)
+            # 直接解析已读入的内容，无需再次读取同一个文件
+            new_version_values = _parse_jsonc(new_config_content)
             new_version = new_version_values.get("version", "unknown")
             old_config_values["version"] = new_version
 
@@ -161,8 +139,7 @@ def main():
                 if pattern.search(new_config_content):
                     new_config_content = pattern.sub(f'\\g<1>{replacement_value}', new_config_content)
 
-            with open(old_config_path, 'w', encoding='utf-8') as f:
-                f.write(new_config_content)
+            write_file_atomic(old_config_path, new_config_content)
             print("配置合并成功。")
 
         except Exception as e: